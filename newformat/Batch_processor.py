@@ -1,6 +1,7 @@
 #!/usr/bin/env python3
 """
 Batch Catalog Processor - Process multiple catalogs at once
+Safe to run from several processes or machines against one shared folder
 """
 
 import sys
@@ -8,9 +9,12 @@ import os
 from pathlib import Path
 from catalog_standardizer import standardize_catalog
 from pdf_to_excel import pdf_to_excel
+from shared_dir import claim, is_temp_or_lock, is_up_to_date, unique_temp_path
 
-def process_directory(input_dir, output_dir=None):
-    """Process all catalog files in a directory"""
+def process_directory(input_dir, output_dir=None, images=False, resume=False):
+    """Process all catalog files in a directory (images=True also extracts PDF swatches).
+    resume=True skips files whose standardized output is newer than the input, so
+    several workers (or a re-run after a crash) only do the remaining files."""
     
     input_path = Path(input_dir)
     
@@ -30,49 +34,47 @@ def process_directory(input_dir, output_dir=None):
     print(f"Output directory: {output_dir}")
     print("=" * 80)
     
-    # Find all Excel and PDF files
-    excel_files = list(input_path.glob("*.xlsx")) + list(input_path.glob("*.xls"))
-    pdf_files = list(input_path.glob("*.pdf"))
+    # Find all Excel and PDF files (ignoring other workers' temp and lock files)
+    excel_files = [f for f in list(input_path.glob("*.xlsx")) + list(input_path.glob("*.xls"))
+                   if not is_temp_or_lock(f)]
+    pdf_files = [f for f in input_path.glob("*.pdf") if not is_temp_or_lock(f)]
     
     total_files = len(excel_files) + len(pdf_files)
     processed = 0
+    skipped = 0
     failed = 0
     
     print(f"\nFound {len(excel_files)} Excel files and {len(pdf_files)} PDF files")
     print("=" * 80)
     
-    # Process PDFs first (convert to Excel)
-    for pdf_file in pdf_files:
-        print(f"\n[{processed + 1}/{total_files}] Processing PDF: {pdf_file.name}")
+    # Process PDFs first (convert to Excel), then Excel files
+    for file_no, input_file in enumerate(pdf_files + excel_files, 1):
+        kind = 'PDF' if input_file.suffix.lower() == '.pdf' else 'Excel'
+        print(f"\n[{file_no}/{total_files}] Processing {kind}: {input_file.name}")
         
-        # Extract PDF to Excel
-        temp_excel = output_dir / f"{pdf_file.stem}_extracted.xlsx"
+        final_output = output_dir / f"{input_file.stem}_STANDARDIZED.xlsx"
         
-        if pdf_to_excel(str(pdf_file), str(temp_excel)):
-            # Now standardize the extracted Excel
-            final_output = output_dir / f"{pdf_file.stem}_STANDARDIZED.xlsx"
+        # Done by an earlier run or another worker
+        if resume and is_up_to_date(final_output, input_file):
+            print(f"  Already standardized (--resume), skipping")
+            skipped += 1
+            continue
+        
+        with claim(final_output) as claimed:
+            if not claimed:
+                print(f"  Claimed by another worker, skipping")
+                skipped += 1
+                continue
+            
+            # Re-check: another worker may have finished it before we claimed it
+            if resume and is_up_to_date(final_output, input_file):
+                skipped += 1
+                continue
             
-            if standardize_catalog(str(temp_excel), str(final_output)):
-                # Remove temp file
-                temp_excel.unlink()
+            if convert_file(input_file, final_output, images):
                 processed += 1
             else:
-                print(f"  ⚠️  Failed to standardize extracted data")
                 failed += 1
-        else:
-            print(f"  ⚠️  Failed to extract PDF data")
-            failed += 1
-    
-    # Process Excel files
-    for excel_file in excel_files:
-        print(f"\n[{processed + 1}/{total_files}] Processing Excel: {excel_file.name}")
-        
-        output_file = output_dir / f"{excel_file.stem}_STANDARDIZED.xlsx"
-        
-        if standardize_catalog(str(excel_file), str(output_file)):
-            processed += 1
-        else:
-            failed += 1
     
     # Summary
     print("\n" + "=" * 80)
@@ -80,13 +82,15 @@ def process_directory(input_dir, output_dir=None):
     print("=" * 80)
     print(f"Total files: {total_files}")
     print(f"✅ Processed successfully: {processed}")
+    if skipped > 0:
+        print(f"⏭️  Skipped ({'already standardized or ' if resume else ''}claimed elsewhere): {skipped}")
     if failed > 0:
         print(f"❌ Failed: {failed}")
     print(f"\nStandardized catalogs saved to: {output_dir}")
     
     return failed == 0
 
-def process_file(input_file, output_file=None):
+def process_file(input_file, output_file=None, images=False):
     """Process a single file (PDF or Excel)"""
     
     input_path = Path(input_file)
@@ -98,31 +102,47 @@ def process_file(input_file, output_file=None):
     if output_file is None:
         output_file = input_path.parent / f"{input_path.stem}_STANDARDIZED.xlsx"
     
-    # Check file type
-    if input_path.suffix.lower() == '.pdf':
-        print("PDF detected - converting to Excel first...")
-        
-        # Extract to temp Excel
-        temp_excel = input_path.parent / f"{input_path.stem}_temp.xlsx"
+    if input_path.suffix.lower() not in ['.pdf', '.xlsx', '.xls']:
+        print(f"Error: Unsupported file type: {input_path.suffix}")
+        print("Supported types: .xlsx, .xls, .pdf")
+        return False
+    
+    with claim(output_file) as claimed:
+        if not claimed:
+            print(f"Error: {Path(output_file).name} is being produced by another worker")
+            return False
         
-        if not pdf_to_excel(str(input_path), str(temp_excel)):
+        return convert_file(input_path, output_file, images)
+
+def convert_file(input_path, output_file, images=False):
+    """Convert one claimed PDF or Excel file. PDFs go through a per-worker temp Excel
+    next to the output, so swatch image paths stay relative to the output folder."""
+    
+    input_path = Path(input_path)
+    
+    if input_path.suffix.lower() != '.pdf':
+        return standardize_catalog(str(input_path), str(output_file))
+    
+    print("PDF detected - converting to Excel first...")
+    
+    # Unique per worker, so parallel runs never share an intermediate file
+    temp_excel = unique_temp_path(Path(output_file).parent / f"{input_path.stem}_extracted.xlsx")
+    
+    try:
+        if not pdf_to_excel(str(input_path), str(temp_excel), images=images):
+            print(f"  ⚠️  Failed to extract PDF data")
             return False
         
         # Standardize the extracted Excel
-        result = standardize_catalog(str(temp_excel), str(output_file))
+        if not standardize_catalog(str(temp_excel), str(output_file)):
+            print(f"  ⚠️  Failed to standardize extracted data")
+            return False
         
+        return True
+    finally:
         # Clean up temp file
-        temp_excel.unlink()
-        
-        return result
-    
-    elif input_path.suffix.lower() in ['.xlsx', '.xls']:
-        return standardize_catalog(str(input_path), str(output_file))
-    
-    else:
-        print(f"Error: Unsupported file type: {input_path.suffix}")
-        print("Supported types: .xlsx, .xls, .pdf")
-        return False
+        if temp_excel.exists():
+            temp_excel.unlink()
 
 if __name__ == "__main__":
     if len(sys.argv) < 2:
@@ -130,29 +150,41 @@ if __name__ == "__main__":
         print("=" * 80)
         print("\nUsage:")
         print("  Process single file:")
-        print("    python batch_processor.py <file> [output_file]")
+        print("    python batch_processor.py <file> [output_file] [--images]")
         print("\n  Process entire directory:")
-        print("    python batch_processor.py --dir <directory> [output_dir]")
+        print("    python batch_processor.py --dir <directory> [output_dir] [--images] [--resume]")
+        print("\n  --images   Extract PDF swatch images into <output folder>/images")
+        print("  --resume   Skip files whose standardized output is newer than the input")
+        print("             (use when several workers share a folder or to finish an")
+        print("             interrupted run; without it every file is reprocessed)")
         print("\nExamples:")
         print("  python batch_processor.py catalog.xlsx")
         print("  python batch_processor.py catalog.pdf standardized.xlsx")
         print("  python batch_processor.py --dir ./catalogs")
         print("  python batch_processor.py --dir ./catalogs ./output")
+        print("  python batch_processor.py --dir ./catalogs ./output --images")
+        print("  python batch_processor.py --dir ./catalogs ./output --resume")
         sys.exit(1)
     
-    if sys.argv[1] == '--dir':
-        if len(sys.argv) < 3:
+    # Extract PDF swatch images into <output folder>/images
+    images = '--images' in sys.argv
+    # Only do files not yet standardized (multi-worker runs, resuming after a crash)
+    resume = '--resume' in sys.argv
+    args = [arg for arg in sys.argv[1:] if arg not in ('--images', '--resume')]
+    
+    if args[0] == '--dir':
+        if len(args) < 2:
             print("Error: Directory path required")
             sys.exit(1)
         
-        input_dir = sys.argv[2]
-        output_dir = sys.argv[3] if len(sys.argv) > 3 else None
+        input_dir = args[1]
+        output_dir = args[2] if len(args) > 2 else None
         
-        success = process_directory(input_dir, output_dir)
+        success = process_directory(input_dir, output_dir, images, resume)
     else:
-        input_file = sys.argv[1]
-        output_file = sys.argv[2] if len(sys.argv) > 2 else None
+        input_file = args[0]
+        output_file = args[1] if len(args) > 1 else None
         
-        success = process_file(input_file, output_file)
+        success = process_file(input_file, output_file, images)
     
     sys.exit(0 if success else 1)
\ No newline at end of file
@@ -6,11 +6,17 @@ Handles Excel files and PDFs from various suppliers
 
 import pandas as pd
 import openpyxl
-from openpyxl.styles import Font, PatternFill, Alignment, Border, Side
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Font, PatternFill, Alignment, Border, Side, NamedStyle
+import numpy as np
+import json
 import re
 import sys
 import os
+from functools import lru_cache
 from pathlib import Path
+from catalog_shards import DEFAULT_SHARD_ROWS, check_shard_options, split_into_shards, unique_names, write_shards
+from shared_dir import atomic_output
 
 # VAYA Standard Column Names (in order)
 VAYA_COLUMNS = [
@@ -30,9 +36,16 @@ VAYA_COLUMNS = [
     'Dealer Price/Mtr (Roll Rate)',
     'Dealer Price after GST (Roll Rate)',
     'RR Price (Cut Rate)',
-    'RR Price after GST (Cut Rate)'
+    'RR Price after GST (Cut Rate)',
+    'Image'
 ]
 
+# Per-supplier pricing rules for the derived Roll Rate / RR columns, loaded
+# from this JSON file (keyed by catalog type, see apply_pricing_rules).
+# Not shipped: copy pricing_rules.example.json and enter each supplier's real
+# terms. Suppliers without a rule keep these columns as the supplier sent them.
+PRICING_RULES_FILE = Path(__file__).with_name('pricing_rules.json')
+
 # Column mapping for different suppliers
 COLUMN_MAPPINGS = {
     'SANSAAR': {
@@ -41,7 +54,9 @@ COLUMN_MAPPINGS = {
         'Material Code': 'HS Code',
         'CL_RATE': 'Updated DP/Mtr (Cut Rate) May 2025',
         'GST': 'GST',
-        'RRP With GST': 'RR Price after GST (Cut Rate)'
+        'RRP With GST': 'RR Price after GST (Cut Rate)',
+        'IMAGE': 'Image',
+        'IMAGE FILE': 'Image'
     },
     'FF_A_dress': {
         'Collection name': 'Collection',
@@ -50,7 +65,9 @@ COLUMN_MAPPINGS = {
         ' Tax %': 'GST',
         'NEW DP': 'Updated DP/Mtr (Cut Rate) May 2025',
         'NEW RC': 'RR Price (Cut Rate)',
-        'NEW MRP': 'RR Price after GST (Cut Rate)'
+        'NEW MRP': 'RR Price after GST (Cut Rate)',
+        'IMAGE': 'Image',
+        'IMAGE FILE': 'Image'
     },
     'FABRIZIO': {
         'COLLECTION NAME': 'Collection',
@@ -62,10 +79,34 @@ COLUMN_MAPPINGS = {
         'WIDTH(INCM)': 'Fabric Width (cm)',
         'GSM': 'Weight/Mt',
         'GST': 'GST',
-        'DP': 'Updated DP/Mtr (Cut Rate) May 2025'
+        'DP': 'Updated DP/Mtr (Cut Rate) May 2025',
+        'IMAGE': 'Image',  # swatch path from pdf_to_excel --images
+        'IMAGE FILE': 'Image'  # same, when the table has its own IMAGE column (listed last, so it wins)
     }
 }
 
+# Price columns that must hold a number when filled
+PRICE_COLUMNS = [
+    'Updated DP/Mtr (Cut Rate) May 2025',
+    'Dealer Price after GST (Cut Rate)',
+    'Dealer Price/Mtr (Roll Rate)',
+    'Dealer Price after GST (Roll Rate)',
+    'RR Price (Cut Rate)',
+    'RR Price after GST (Cut Rate)'
+]
+
+# GST slabs accepted for fabrics (as decimals, after calculate_gst_prices)
+GST_SLABS = [0.0, 0.05, 0.12, 0.18, 0.28]
+
+# Right-aligned (numeric) column positions in the VAYA sheet
+NUMERIC_COLUMN_INDEXES = [3, 4, 5, 6, 7, 10, 11, 12, 13, 14, 15, 16]
+
+# Columns stored as float64 in the compact representation
+NUMERIC_COLUMNS = PRICE_COLUMNS + ['GST']
+
+# Text columns become categoricals when distinct values are at most this share of rows
+CATEGORY_MAX_RATIO = 0.5
+
 def clean_numeric_value(value):
     """Clean and convert numeric values"""
     if pd.isna(value):
@@ -117,35 +158,71 @@ def map_columns(df, catalog_type):
     
     mapping = COLUMN_MAPPINGS[catalog_type]
     
-    # Create a new dataframe with VAYA columns
-    standardized_df = pd.DataFrame()
-    
     # Map available columns
+    mapped = {}
     for source_col, target_col in mapping.items():
         if source_col in df.columns:
-            standardized_df[target_col] = df[source_col]
+            mapped[target_col] = df[source_col]
     
-    # Add missing columns with empty values
-    for col in VAYA_COLUMNS:
-        if col not in standardized_df.columns:
-            standardized_df[col] = None
+    # Build the frame in one go, in VAYA column order, missing columns empty
+    empty = pd.Series(None, index=df.index, dtype=object)
+    standardized_df = pd.DataFrame({col: mapped.get(col, empty) for col in VAYA_COLUMNS})
     
-    # Reorder to match VAYA column order
-    standardized_df = standardized_df[VAYA_COLUMNS]
+    # Repetitive text (Collection, Composition, End Use...) as categoricals
+    return compact_text_columns(standardized_df)
+
+def compact_text_columns(df):
+    """Convert low-cardinality text columns to categoricals"""
+    
+    for col in df.columns:
+        if col in NUMERIC_COLUMNS or isinstance(df[col].dtype, pd.CategoricalDtype):
+            continue
+        if not (pd.api.types.is_object_dtype(df[col]) or pd.api.types.is_string_dtype(df[col])):
+            continue
+        
+        # Empty columns also qualify: a categorical with no categories costs 1 byte/row
+        filled = df[col].notna().sum()
+        if df[col].nunique() <= filled * CATEGORY_MAX_RATIO:
+            df[col] = df[col].astype('category')
     
-    return standardized_df
+    return df
+
+def compact_catalog(df):
+    """Compact representation: float64 prices/GST, categoricals for repetitive text.
+    Only lossless conversions are made, so the written output does not change."""
+    
+    numeric = {}
+    for col in NUMERIC_COLUMNS:
+        if col not in df.columns or pd.api.types.is_float_dtype(df[col]):
+            continue
+        
+        # Only columns holding plain numbers already; text the supplier put in a
+        # price cell ('ask', '₹1,200') is kept as written and left to validation
+        if pd.api.types.infer_dtype(df[col], skipna=True) in ('integer', 'floating', 'mixed-integer-float', 'empty'):
+            numeric[col] = df[col].astype(float)
+    
+    return compact_text_columns(df.assign(**numeric))
+
+def memory_report(sheet_name, source_mb, compact_df):
+    """Print the size of the raw sheet (released after mapping) and of the compact
+    standardized sheet that is held until the workbook is written"""
+    
+    compact_mb = compact_df.memory_usage(deep=True).sum() / 1024 ** 2
+    
+    print(f"  Memory: raw sheet {source_mb:.1f} MB (released), standardized sheet {compact_mb:.1f} MB held for writing")
+    return {'sheet': sheet_name, 'source_mb': source_mb, 'compact_mb': compact_mb}
 
 def calculate_gst_prices(df):
     """Calculate GST-inclusive prices if missing"""
     
     # Clean numeric columns
     if 'Updated DP/Mtr (Cut Rate) May 2025' in df.columns:
-        df['Updated DP/Mtr (Cut Rate) May 2025'] = df['Updated DP/Mtr (Cut Rate) May 2025'].apply(clean_numeric_value)
+        df['Updated DP/Mtr (Cut Rate) May 2025'] = to_numeric_column(df['Updated DP/Mtr (Cut Rate) May 2025'])
     
     if 'GST' in df.columns:
-        df['GST'] = df['GST'].apply(clean_numeric_value)
+        df['GST'] = to_numeric_column(df['GST'])
         # Convert percentage to decimal if needed (e.g., 5% -> 0.05)
-        df['GST'] = df['GST'].apply(lambda x: x/100 if x and x > 1 else x)
+        df['GST'] = df['GST'].where(~(df['GST'] > 1), df['GST'] / 100)
     
     # Calculate Dealer Price after GST if missing
     if 'Dealer Price after GST (Cut Rate)' in df.columns:
@@ -160,22 +237,211 @@ def calculate_gst_prices(df):
         mask = df['RR Price after GST (Cut Rate)'].isna()
         if mask.any() and 'GST' in df.columns:
             df.loc[mask, 'RR Price after GST (Cut Rate)'] = (
-                df.loc[mask, 'RR Price (Cut Rate)'] * (1 + df.loc[mask, 'GST'].fillna(0))
+                to_numeric_column(df.loc[mask, 'RR Price (Cut Rate)']) * (1 + df.loc[mask, 'GST'].fillna(0))
             )
     
     return df
 
-def apply_vaya_formatting(workbook, sheet):
-    """Apply VAYA-style formatting to the sheet"""
+# Allowed pricing rule fields and their valid ranges (see apply_pricing_rules)
+PRICING_RULE_RANGES = {
+    'roll_discount': (0, 1),
+    'rr_markup': (0, None),
+    'round_to': (0, None)
+}
+ROUNDING_MODES = ['nearest', 'up', 'down']
+
+def check_pricing_rules(rules, source='pricing rules'):
+    """Raise ValueError naming the supplier and field for any invalid rule entry"""
     
-    # Define styles
-    header_font = Font(name='Arial', size=11, bold=True, color='FFFFFF')
-    header_fill = PatternFill(start_color='4472C4', end_color='4472C4', fill_type='solid')
-    header_alignment = Alignment(horizontal='center', vertical='center', wrap_text=True)
+    if not isinstance(rules, dict):
+        raise ValueError(f"{source}: expected an object keyed by catalog type")
     
-    cell_font = Font(name='Arial', size=10)
-    cell_alignment = Alignment(horizontal='left', vertical='center')
-    number_alignment = Alignment(horizontal='right', vertical='center')
+    for supplier, rule in rules.items():
+        if not isinstance(rule, dict):
+            raise ValueError(f"{source}: rule for {supplier} must be an object")
+        
+        for field, value in rule.items():
+            if field == 'rounding':
+                if value not in ROUNDING_MODES:
+                    raise ValueError(f"{source}: {supplier}.rounding must be one of {ROUNDING_MODES}, got {value!r}")
+                continue
+            
+            if field not in PRICING_RULE_RANGES:
+                allowed = sorted(list(PRICING_RULE_RANGES) + ['rounding'])
+                raise ValueError(f"{source}: {supplier} has unknown field {field!r} (allowed: {allowed})")
+            
+            low, high = PRICING_RULE_RANGES[field]
+            if isinstance(value, bool) or not isinstance(value, (int, float)):
+                raise ValueError(f"{source}: {supplier}.{field} must be a number, got {value!r}")
+            if value < low or (high is not None and value >= high):
+                limit = f"at least {low}" + (f" and below {high}" if high is not None else "")
+                raise ValueError(f"{source}: {supplier}.{field} must be {limit}, got {value!r}")
+    
+    return rules
+
+@lru_cache(maxsize=None)
+def load_pricing_rules(rules_file=PRICING_RULES_FILE):
+    """Load and check the pricing rule table once per process"""
+    
+    rules_path = Path(rules_file)
+    if not rules_path.exists():
+        return {}
+    
+    with open(rules_path, encoding='utf-8') as f:
+        return check_pricing_rules(json.load(f), rules_path.name)
+
+def round_prices(values, round_to=1, rounding='nearest'):
+    """Round a price column to a multiple of round_to (nearest, up or down)"""
+    
+    if not round_to:
+        return values
+    
+    round_func = {'nearest': np.round, 'up': np.ceil, 'down': np.floor}[rounding]
+    return round_func(values / round_to) * round_to
+
+def apply_pricing_rules(df, catalog_type, rules=None):
+    """Fill missing Roll Rate and RR price columns from the supplier's pricing rule.
+    
+    Rule fields (all optional):
+      roll_discount  Roll Rate DP = Cut Rate DP * (1 - roll_discount)
+      rr_markup      RR Price (Cut Rate) = Cut Rate DP * (1 + rr_markup), except
+                     where the supplier gave RR Price after GST: then it is
+                     that price / (1 + GST), so the two never disagree
+      round_to       round derived prices to this multiple (e.g. 1, 5, 10)
+      rounding       'nearest', 'up' or 'down'
+    Values already present in the catalog are kept.
+    """
+    
+    rules = check_pricing_rules(rules) if rules is not None else load_pricing_rules()
+    rule = rules.get(catalog_type)
+    if not rule:
+        return df
+    
+    dp = to_numeric_column(df['Updated DP/Mtr (Cut Rate) May 2025'])
+    gst_factor = 1 + to_numeric_column(df['GST']).fillna(0)
+    round_to = rule.get('round_to', 1)
+    rounding = rule.get('rounding', 'nearest')
+    
+    def fill_missing(column, values):
+        df[column] = df[column].where(df[column].notna(), values)
+    
+    if 'roll_discount' in rule:
+        fill_missing('Dealer Price/Mtr (Roll Rate)',
+                     round_prices(dp * (1 - rule['roll_discount']), round_to, rounding))
+        fill_missing('Dealer Price after GST (Roll Rate)',
+                     to_numeric_column(df['Dealer Price/Mtr (Roll Rate)']) * gst_factor)
+    
+    if 'rr_markup' in rule:
+        # Supplier's RRP with GST wins over the markup (e.g. SANSAAR 'RRP With GST')
+        rr_after_gst = to_numeric_column(df['RR Price after GST (Cut Rate)'])
+        marked_up = round_prices(dp * (1 + rule['rr_markup']), round_to, rounding)
+        fill_missing('RR Price (Cut Rate)',
+                     (rr_after_gst / gst_factor).round(2).where(rr_after_gst.notna(), marked_up))
+        fill_missing('RR Price after GST (Cut Rate)',
+                     to_numeric_column(df['RR Price (Cut Rate)']) * gst_factor)
+    
+    return df
+
+def map_unique_values(series, func, missing):
+    """Apply a column function to the distinct values only and broadcast back.
+    Catalog columns repeat the same few values, so this avoids per-row string work."""
+    codes, uniques = pd.factorize(series)
+    result = np.asarray(func(pd.Series(uniques, dtype=object)))
+    if len(result) == 0:
+        return np.full(len(series), missing)
+    return np.where(codes >= 0, result[codes], missing)
+
+def to_numeric_column(series):
+    """Vectorized version of clean_numeric_value for a whole column"""
+    if pd.api.types.is_numeric_dtype(series):
+        return series.astype(float)
+    
+    def convert(values):
+        # Same symbols as clean_numeric_value, stripped in one pass
+        cleaned = values.astype(str).str.strip().str.replace(r'₹|/-|,|%', '', regex=True)
+        return pd.to_numeric(cleaned, errors='coerce').astype(float)
+    
+    return pd.Series(map_unique_values(series, convert, np.nan), index=series.index)
+
+def blank_mask(series):
+    """True where a cell is empty or only whitespace"""
+    return map_unique_values(series, lambda values: values.astype(str).str.strip() == '', True)
+
+def validate_catalog(df, supplier_values=None):
+    """Validate standardized rows using column masks, returns (report_df, valid_mask).
+    Rows are reported by their row number in the source sheet, taken from the
+    index pd.read_excel assigns (0 = first data row under the header).
+    supplier_values holds the DP and GST columns as mapped, before
+    calculate_gst_prices coerced them, so bad entries are reported as written."""
+    
+    if supplier_values is None:
+        supplier_values = df[['Updated DP/Mtr (Cut Rate) May 2025', 'GST']]
+    supplier_values = supplier_values.loc[df.index]
+    
+    # Source sheet row numbers (header is row 1); these don't shift when
+    # --clean-only drops rows or the output is sharded
+    row_numbers = df.index.to_numpy() + 2
+    checks = []
+    
+    # 1. Collection must be filled
+    checks.append(('Collection', 'Missing Collection', blank_mask(df['Collection'])))
+    
+    # 2. Dealer price must be present, every filled price must be numeric
+    dp_col = 'Updated DP/Mtr (Cut Rate) May 2025'
+    dp_missing = blank_mask(supplier_values[dp_col])
+    checks.append((dp_col, 'Missing price', dp_missing))
+    checks.append((dp_col, 'Non-numeric price', ~dp_missing & to_numeric_column(supplier_values[dp_col]).isna()))
+    
+    for col in PRICE_COLUMNS:
+        if col == dp_col:
+            continue
+        filled = df[col].notna()
+        if not filled.any():
+            continue
+        checks.append((col, 'Non-numeric price', filled & to_numeric_column(df[col]).isna()))
+    
+    # 3. HSN code must be exactly 8 digits when given (Excel may read it as 55121900.0)
+    bad_hsn = map_unique_values(
+        df['HS Code'],
+        lambda values: ~values.astype(str).str.strip().str.replace(r'\.0$', '', regex=True).str.fullmatch(r'\d{8}'),
+        False
+    )
+    checks.append(('HS Code', 'HSN code is not 8 digits', bad_hsn))
+    
+    # 4. GST must be a number, and one of the standard slabs
+    gst_filled = ~blank_mask(supplier_values['GST'])
+    checks.append(('GST', 'Non-numeric GST', gst_filled & to_numeric_column(supplier_values['GST']).isna()))
+    
+    gst = to_numeric_column(df['GST'])
+    in_slab = np.isclose(gst.to_numpy()[:, None], GST_SLABS).any(axis=1)
+    checks.append(('GST', 'GST outside standard slabs', gst.notna() & ~in_slab))
+    
+    # Build row-level report from the masks
+    reports = []
+    valid_mask = np.ones(len(df), dtype=bool)
+    
+    for column, error, mask in checks:
+        mask = np.asarray(mask, dtype=bool)
+        if not mask.any():
+            continue
+        valid_mask &= ~mask
+        reports.append(pd.DataFrame({
+            'Source Row': row_numbers[mask],
+            'Column': column,
+            'Error': error,
+            'Value': (supplier_values if column in supplier_values.columns else df)[column].to_numpy()[mask]
+        }))
+    
+    if reports:
+        report_df = pd.concat(reports, ignore_index=True).sort_values('Source Row', kind='stable')
+    else:
+        report_df = pd.DataFrame(columns=['Source Row', 'Column', 'Error', 'Value'])
+    
+    return report_df.reset_index(drop=True), pd.Series(valid_mask, index=df.index)
+
+def add_vaya_styles(workbook):
+    """Register the VAYA cell styles once per workbook (named styles keep
+    write-only workbooks from storing formatting per cell)"""
     
     border = Border(
         left=Side(style='thin', color='000000'),
@@ -184,28 +450,28 @@ def apply_vaya_formatting(workbook, sheet):
         bottom=Side(style='thin', color='000000')
     )
     
-    # Format header row
-    for cell in sheet[1]:
-        cell.font = header_font
-        cell.fill = header_fill
-        cell.alignment = header_alignment
-        cell.border = border
+    header = NamedStyle(name='vaya_header', border=border)
+    header.font = Font(name='Arial', size=11, bold=True, color='FFFFFF')
+    header.fill = PatternFill(start_color='4472C4', end_color='4472C4', fill_type='solid')
+    header.alignment = Alignment(horizontal='center', vertical='center', wrap_text=True)
+    
+    text = NamedStyle(name='vaya_text', border=border)
+    text.font = Font(name='Arial', size=10)
+    text.alignment = Alignment(horizontal='left', vertical='center')
+    
+    number = NamedStyle(name='vaya_number', border=border)
+    number.font = Font(name='Arial', size=10)
+    number.alignment = Alignment(horizontal='right', vertical='center')
+    
+    for style in (header, text, number):
+        workbook.add_named_style(style)
+
+def apply_vaya_formatting(workbook, sheet):
+    """Apply VAYA sheet layout. Must run before rows are written (write-only sheets)"""
     
     # Set row height for header
     sheet.row_dimensions[1].height = 30
     
-    # Format data rows
-    for row in sheet.iter_rows(min_row=2, max_row=sheet.max_row):
-        for idx, cell in enumerate(row):
-            cell.font = cell_font
-            cell.border = border
-            
-            # Right-align numeric columns
-            if idx in [3, 4, 5, 6, 7, 10, 11, 12, 13, 14, 15, 16]:  # Numeric columns
-                cell.alignment = number_alignment
-            else:
-                cell.alignment = cell_alignment
-    
     # Set column widths
     column_widths = {
         'A': 25,  # Collection
@@ -224,7 +490,8 @@ def apply_vaya_formatting(workbook, sheet):
         'N': 20,  # Dealer Price (Roll)
         'O': 20,  # Dealer Price after GST (Roll)
         'P': 20,  # RR Price (Cut)
-        'Q': 25   # RR Price after GST (Cut)
+        'Q': 25,  # RR Price after GST (Cut)
+        'R': 40   # Image
     }
     
     for col, width in column_widths.items():
@@ -233,8 +500,48 @@ def apply_vaya_formatting(workbook, sheet):
     # Freeze header row
     sheet.freeze_panes = 'A2'
 
-def standardize_catalog(input_file, output_file=None):
-    """Main function to standardize a catalog to VAYA format"""
+def write_vaya_workbook(output_file, sheets):
+    """Write (sheet_name, df) pairs to a VAYA formatted workbook.
+    Rows are streamed (write-only workbook), so no Cell objects pile up in memory."""
+    
+    wb_out = openpyxl.Workbook(write_only=True)
+    add_vaya_styles(wb_out)
+    
+    for sheet_name, df in sheets:
+        ws = wb_out.create_sheet(title=sheet_name)
+        apply_vaya_formatting(wb_out, ws)
+        
+        # Write headers
+        header_cells = []
+        for col_name in VAYA_COLUMNS:
+            cell = WriteOnlyCell(ws, value=col_name)
+            cell.style = 'vaya_header'
+            header_cells.append(cell)
+        ws.append(header_cells)
+        
+        # One reusable styled cell per column; each row is serialized on append
+        cells = []
+        for idx in range(len(df.columns)):
+            cell = WriteOnlyCell(ws)
+            cell.style = 'vaya_number' if idx in NUMERIC_COLUMN_INDEXES else 'vaya_text'
+            cells.append(cell)
+        
+        # Write data
+        for row in df.itertuples(index=False):
+            for cell, value in zip(cells, row):
+                # Missing values (NaN from numeric/categorical columns) stay blank
+                cell.value = None if pd.isna(value) else value
+            ws.append(cells)
+    
+    # Written under a temp name, so a killed run never leaves a half-written file
+    with atomic_output(output_file) as temp_file:
+        wb_out.save(temp_file)
+
+def standardize_catalog(input_file, output_file=None, validate=True, clean_only=False,
+                        shard_by=None, shard_rows=DEFAULT_SHARD_ROWS, shard_mode='workbooks'):
+    """Main function to standardize a catalog to VAYA format.
+    shard_by='collection' or 'rows' splits the output into several workbooks
+    (shard_mode='workbooks') or sheets (shard_mode='sheets') plus an index file."""
     
     input_path = Path(input_file)
     
@@ -246,58 +553,112 @@ def standardize_catalog(input_file, output_file=None):
     if output_file is None:
         output_file = input_path.parent / f"{input_path.stem}_STANDARDIZED.xlsx"
     
+    output_path = Path(output_file)
+    error_reports = {}
+    
+    # Bad sharding options are a caller error, not a per-file failure
+    if shard_by:
+        check_shard_options(shard_by, shard_rows, shard_mode)
+    
     try:
         # Read the Excel file
         print(f"Reading {input_path.name}...")
         
-        # Try to read all sheets
-        all_sheets = pd.read_excel(input_file, sheet_name=None)
-        
-        # Create output workbook
-        wb_out = openpyxl.Workbook()
-        wb_out.remove(wb_out.active)  # Remove default sheet
+        # Read one sheet at a time, so only one raw sheet is alive at once
+        output_sheets = []
+        with pd.ExcelFile(input_file) as excel_file:
+            for sheet_name in excel_file.sheet_names:
+                df = excel_file.parse(sheet_name)
+                if df.empty:
+                    continue
+                
+                print(f"\nProcessing sheet: {sheet_name}")
+                
+                # Detect catalog type
+                catalog_type = detect_catalog_type(df, input_path.name)
+                print(f"  Detected type: {catalog_type}")
+                
+                # Map columns to VAYA standard
+                standardized_df = map_columns(df, catalog_type)
+                
+                # Release the raw sheet (unknown layouts are passed through as-is)
+                source_mb = df.memory_usage(deep=True).sum() / 1024 ** 2
+                del df
+                
+                # DP and GST as the supplier wrote them, for the validation report
+                # (unknown layouts keep their own columns and are not validated)
+                validating = validate and catalog_type in COLUMN_MAPPINGS
+                if validating:
+                    supplier_values = standardized_df[['Updated DP/Mtr (Cut Rate) May 2025', 'GST']].copy()
+                
+                # Calculate GST prices
+                standardized_df = calculate_gst_prices(standardized_df)
+                
+                # Derive Roll Rate / RR prices from the supplier's pricing rule
+                standardized_df = apply_pricing_rules(standardized_df, catalog_type)
+                
+                # Remove completely empty rows
+                standardized_df = standardized_df.dropna(how='all')
+                
+                # Validate rows before writing
+                if validating:
+                    report_df, valid_mask = validate_catalog(standardized_df, supplier_values)
+                    del supplier_values
+                    if not report_df.empty:
+                        print(f"  ⚠️  {report_df['Source Row'].nunique()} invalid row(s), {len(report_df)} error(s)")
+                        report_df.insert(0, 'Sheet', sheet_name)
+                        error_reports[sheet_name] = report_df
+                        if clean_only:
+                            standardized_df = standardized_df[valid_mask]
+                            print(f"  Keeping {len(standardized_df)} clean row(s)")
+                
+                # Hold the sheet in its compact form until it is written
+                if catalog_type in COLUMN_MAPPINGS:
+                    standardized_df = compact_catalog(standardized_df)
+                    memory_report(sheet_name, source_mb, standardized_df)
+                
+                output_sheets.append((sheet_name, standardized_df))
         
-        sheet_count = 0
-        for sheet_name, df in all_sheets.items():
-            if df.empty:
-                continue
-            
-            print(f"\nProcessing sheet: {sheet_name}")
+        if shard_by:
+            # Split each sheet, prefixing shard names when there are several sheets
+            shards = []
+            shard_sheets = []
+            for sheet_name, standardized_df in output_sheets:
+                for key, shard_df in split_into_shards(standardized_df, shard_by, 'Collection', shard_rows):
+                    name = f"{sheet_name}_{key}" if len(output_sheets) > 1 else key
+                    shards.append((name, shard_df))
+                    shard_sheets.append(sheet_name)
             
-            # Detect catalog type
-            catalog_type = detect_catalog_type(df, input_path.name)
-            print(f"  Detected type: {catalog_type}")
+            # Final shard names, so the error report can say where each row went
+            shard_names = unique_names([name for name, _ in shards])
+            shards = [(name, shard_df) for name, (_, shard_df) in zip(shard_names, shards)]
             
-            # Map columns to VAYA standard
-            standardized_df = map_columns(df, catalog_type)
+            for report_df in error_reports.values():
+                report_df['Shard'] = ''
+            for sheet_name, (name, shard_df) in zip(shard_sheets, shards):
+                if sheet_name in error_reports:
+                    report_df = error_reports[sheet_name]
+                    report_df.loc[report_df['Source Row'].isin(shard_df.index + 2), 'Shard'] = name
             
-            # Calculate GST prices
-            standardized_df = calculate_gst_prices(standardized_df)
-            
-            # Remove completely empty rows
-            standardized_df = standardized_df.dropna(how='all')
-            
-            # Create sheet
-            ws = wb_out.create_sheet(title=sheet_name)
-            
-            # Write headers
-            for col_idx, col_name in enumerate(VAYA_COLUMNS, start=1):
-                ws.cell(row=1, column=col_idx, value=col_name)
-            
-            # Write data
-            for row_idx, row in enumerate(standardized_df.itertuples(index=False), start=2):
-                for col_idx, value in enumerate(row, start=1):
-                    ws.cell(row=row_idx, column=col_idx, value=value)
-            
-            # Apply formatting
-            apply_vaya_formatting(wb_out, ws)
-            
-            sheet_count += 1
+            entries = write_shards(output_path, shards, write_vaya_workbook, shard_mode)
+            print(f"\n✅ SUCCESS! Standardized catalog saved as {len(entries)} shard(s) ({shard_mode})")
+            print(f"   Index: {output_path.parent / f'{output_path.stem}_INDEX.json'}")
+        else:
+            # Save workbook
+            write_vaya_workbook(output_file, output_sheets)
+            print(f"\n✅ SUCCESS! Standardized catalog saved to: {output_file}")
+        
+        print(f"   Processed {len(output_sheets)} sheet(s)")
         
-        # Save workbook
-        wb_out.save(output_file)
-        print(f"\n✅ SUCCESS! Standardized catalog saved to: {output_file}")
-        print(f"   Processed {sheet_count} sheet(s)")
+        # Save validation report next to the output, or remove one left by an earlier run
+        report_file = output_path.parent / f"{output_path.stem}_ERRORS.csv"
+        if error_reports:
+            with atomic_output(report_file) as temp_file:
+                pd.concat(error_reports.values(), ignore_index=True).to_csv(temp_file, index=False)
+            print(f"   Validation report saved to: {report_file}")
+        elif report_file.exists():
+            report_file.unlink()
+            print(f"   Removed outdated validation report: {report_file}")
         
         return True
         
@@ -309,14 +670,29 @@ def standardize_catalog(input_file, output_file=None):
 
 if __name__ == "__main__":
     if len(sys.argv) < 2:
-        print("Usage: python catalog_standardizer.py <input_file> [output_file]")
+        print("Usage: python catalog_standardizer.py <input_file> [output_file] [--clean-only] [--no-validate]")
+        print("       [--shard-by=collection|rows] [--shard-rows=N] [--shard-mode=workbooks|sheets]")
         print("\nExample:")
         print("  python catalog_standardizer.py SANSAAR_NEW_PRICE_LIST.xlsx")
         print("  python catalog_standardizer.py input.xlsx output_standardized.xlsx")
+        print("  python catalog_standardizer.py input.xlsx --clean-only")
+        print("  python catalog_standardizer.py input.xlsx --shard-by=collection")
         sys.exit(1)
     
-    input_file = sys.argv[1]
-    output_file = sys.argv[2] if len(sys.argv) > 2 else None
-    
-    success = standardize_catalog(input_file, output_file)
+    # --name or --name=value options
+    flags = dict((arg[2:].split('=', 1) + [True])[:2] for arg in sys.argv[1:] if arg.startswith('--'))
+    args = [arg for arg in sys.argv[1:] if not arg.startswith('--')]
+    
+    input_file = args[0]
+    output_file = args[1] if len(args) > 1 else None
+    
+    success = standardize_catalog(
+        input_file,
+        output_file,
+        validate='no-validate' not in flags,
+        clean_only='clean-only' in flags,
+        shard_by=flags.get('shard-by'),
+        shard_rows=int(flags.get('shard-rows', DEFAULT_SHARD_ROWS)),
+        shard_mode=flags.get('shard-mode', 'workbooks')
+    )
     sys.exit(0 if success else 1)
\ No newline at end of file
@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""
+Catalog Shards - Split large catalog outputs into several workbooks or sheets
+Shards are written concurrently and listed in a small JSON index file
+"""
+
+import json
+import numbers
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from shared_dir import atomic_output
+
+# Excel limits
+EXCEL_MAX_ROWS = 1048576
+EXCEL_MAX_SHEET_NAME = 31
+
+DEFAULT_SHARD_ROWS = 100000
+SHARD_BY = ['collection', 'rows']
+SHARD_MODES = ['workbooks', 'sheets']
+
+def check_shard_options(shard_by, shard_rows=DEFAULT_SHARD_ROWS, shard_mode='workbooks'):
+    """Raise ValueError for unknown sharding options instead of silently falling back"""
+    if shard_by not in SHARD_BY:
+        raise ValueError(f"shard_by must be one of {SHARD_BY}, got {shard_by!r}")
+    if shard_mode not in SHARD_MODES:
+        raise ValueError(f"shard_mode must be one of {SHARD_MODES}, got {shard_mode!r}")
+    if isinstance(shard_rows, bool) or not isinstance(shard_rows, numbers.Integral) or shard_rows < 1:
+        raise ValueError(f"shard_rows must be a positive integer, got {shard_rows!r}")
+
+def safe_name(value, max_length=EXCEL_MAX_SHEET_NAME):
+    """Make a value usable as both a sheet name and part of a filename"""
+    name = re.sub(r'[\[\]:*?/\\<>|"]', '_', str(value)).strip().strip("'")
+    return (name or 'EMPTY')[:max_length]
+
+def unique_names(names, max_length=EXCEL_MAX_SHEET_NAME):
+    """Deduplicate names that collide after cleaning/truncating"""
+    seen = set()
+    result = []
+    for name in names:
+        candidate = safe_name(name, max_length)
+        counter = 2
+        while candidate.upper() in seen:
+            suffix = f"_{counter}"
+            candidate = safe_name(name, max_length - len(suffix)) + suffix
+            counter += 1
+        seen.add(candidate.upper())
+        result.append(candidate)
+    return result
+
+def split_into_shards(df, shard_by, collection_column=None, shard_rows=DEFAULT_SHARD_ROWS):
+    """Split a DataFrame into (key, shard_df) pairs by collection or row count"""
+    check_shard_options(shard_by, shard_rows)
+
+    if shard_by == 'collection':
+        if collection_column in df.columns:
+            shards = []
+            groups = df.groupby(collection_column, sort=False, dropna=False, observed=True)
+            for key, shard_df in groups:
+                key = 'NO_COLLECTION' if key != key or str(key).strip() == '' else key
+
+                # A single huge collection still has to fit in a sheet
+                if len(shard_df) > shard_rows:
+                    for part, (_, part_df) in enumerate(split_into_shards(shard_df, 'rows', shard_rows=shard_rows), 1):
+                        shards.append((f"{key}_{part}", part_df))
+                else:
+                    shards.append((key, shard_df))
+            return shards
+
+        print(f"  ! No '{collection_column}' column, sharding by row count instead")
+
+    shard_rows = min(shard_rows, EXCEL_MAX_ROWS - 1)
+    return [(f"part{start // shard_rows + 1}", df.iloc[start:start + shard_rows])
+            for start in range(0, len(df), shard_rows)]
+
+def write_shards(output_path, sheets, write_workbook, mode='workbooks', workers=None):
+    """Write sharded sheets and an index file next to output_path.
+
+    sheets is a list of (sheet_name, df) pairs. write_workbook(path, sheets)
+    must be a module-level function so it can run in worker processes.
+    Returns the list of index entries.
+    """
+
+    if mode not in SHARD_MODES:
+        raise ValueError(f"shard_mode must be one of {SHARD_MODES}, got {mode!r}")
+    
+    output_path = Path(output_path)
+    sheet_names = unique_names([name for name, _ in sheets])
+    sheets = [(name, df) for name, (_, df) in zip(sheet_names, sheets)]
+
+    if mode == 'sheets':
+        # One workbook cannot be written from several processes
+        write_workbook(str(output_path), sheets)
+        entries = [{'file': output_path.name, 'sheet': name, 'rows': len(df)} for name, df in sheets]
+    else:
+        jobs = []
+        for name, df in sheets:
+            shard_path = output_path.parent / f"{output_path.stem}_{safe_name(name, 100)}{output_path.suffix}"
+            jobs.append((shard_path, [(name, df)]))
+
+        workers = min(workers or os.cpu_count() or 1, len(jobs))
+        if workers > 1:
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                futures = [executor.submit(write_workbook, str(path), job_sheets) for path, job_sheets in jobs]
+                for future in futures:
+                    future.result()
+        else:
+            for path, job_sheets in jobs:
+                write_workbook(str(path), job_sheets)
+
+        entries = [{'file': path.name, 'sheet': job_sheets[0][0], 'rows': len(job_sheets[0][1])}
+                   for path, job_sheets in jobs]
+
+    write_shard_index(output_path, mode, entries)
+    return entries
+
+def write_shard_index(output_path, mode, entries):
+    """Write <output>_INDEX.json listing the shards for downstream uploads"""
+
+    output_path = Path(output_path)
+    index_path = output_path.parent / f"{output_path.stem}_INDEX.json"
+    index = {
+        'output': output_path.name,
+        'mode': mode,
+        'total_rows': sum(entry['rows'] for entry in entries),
+        'shards': entries
+    }
+
+    with atomic_output(index_path) as temp_path:
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(index, f, indent=2, ensure_ascii=False)
+
+    return index_path
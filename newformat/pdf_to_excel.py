@@ -3,28 +3,63 @@
 PDF Catalog Converter - Extract catalog data from PDFs to Excel format
 """
 
+import contextlib
+import hashlib
+import io
+import os
 import re
 import sys
 import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 import pdfplumber
+from PIL import Image
+from catalog_shards import DEFAULT_SHARD_ROWS, check_shard_options, split_into_shards, write_shards
+from shared_dir import atomic_output
+
+# Private keys recording where each extracted row sits on its page
+ROW_POSITION_KEYS = ['_page', '_top', '_bottom']
+
+# Image stage settings
+IMAGE_COLUMN = 'IMAGE'
+IMAGE_FALLBACK_COLUMN = 'IMAGE FILE'  # when the table has an IMAGE column of its own
+THUMBNAIL_SIZE = (256, 256)
+MIN_IMAGE_SIZE = 20  # points; smaller images are bullets/icons, not swatches
+
+# Auto-detection samples this many pages
+SAMPLE_PAGES = 3
+
+# Ruled tables holding at least this share of the product lines are read as tables
+TABLE_COVERAGE = 0.8
+
+# Known supplier layouts, matched against the sampled pages' text
+PDF_LAYOUTS = {
+    'fabrizio': {
+        'header_keywords': ['COLLECTION NAME', 'PRODUCT NAME', 'COMPOSITION', 'MARTINDALE', 'HSNCODE'],
+        # Only Fabrizio uses these together (same check as detect_catalog_type)
+        'marker_keywords': ['PRODUCT NAME', 'HSNCODE'],
+        'row_keywords': ['100%', 'POLYESTER', 'PES', 'PVC', 'NYL'],
+        'row_pattern': r'\d{8}|\d{4,6}\+|\d{3,4}/?-?\s*$'
+    }
+}
+
+def open_pdf(pdf):
+    """Open a PDF path, or reuse an already open pdfplumber PDF"""
+    if isinstance(pdf, pdfplumber.PDF):
+        return contextlib.nullcontext(pdf)
+    return pdfplumber.open(pdf)
 
 def extract_fabrizio_data(pdf_path):
     """Extract data from Fabrizio-style PDF catalogs using Regex"""
     
     products = []
     
-    with pdfplumber.open(pdf_path) as pdf:
-        for page in pdf.pages:
-            text = page.extract_text()
-            
-            if not text:
-                continue
-            
-            # Split by lines
-            lines = text.split('\n')
-            
-            for line in lines:
+    with open_pdf(pdf_path) as pdf:
+        for page_no, page in enumerate(pdf.pages):
+            # Text lines with their vertical position on the page
+            for text_line in page.extract_text_lines():
+                line = text_line['text']
+                
                 # Look for product rows (contains composition, martindale, etc.)
                 if any(keyword in line.upper() for keyword in ['100%', 'POLYESTER', 'PES', 'PVC', 'NYL']):
                     
@@ -86,6 +121,9 @@ def extract_fabrizio_data(pdf_path):
                         
                         # Only add if we got some key fields
                         if len(product) >= 3:
+                            product['_page'] = page_no
+                            product['_top'] = text_line['top']
+                            product['_bottom'] = text_line['bottom']
                             products.append(product)
                         
                     except Exception:
@@ -98,12 +136,12 @@ def extract_generic_table(pdf_path):
     
     all_data = []
     
-    with pdfplumber.open(pdf_path) as pdf:
-        for page in pdf.pages:
-            # Extract tables
-            tables = page.extract_tables()
-            
-            for table in tables:
+    with open_pdf(pdf_path) as pdf:
+        for page_no, page in enumerate(pdf.pages):
+            # Find tables (keeps row positions, unlike extract_tables)
+            for found_table in page.find_tables():
+                table = found_table.extract()
+                
                 if not table or len(table) < 2:
                     continue
                 
@@ -118,7 +156,7 @@ def extract_generic_table(pdf_path):
                         headers.append(str(h).replace('\n', ' ').strip())
                 
                 # Add data rows
-                for row in table[1:]:
+                for row, table_row in zip(table[1:], found_table.rows[1:]):
                     # Ensure row length matches headers
                     if len(row) == len(headers):
                         # Clean row data (handle None)
@@ -127,11 +165,188 @@ def extract_generic_table(pdf_path):
                         
                         # Skip empty rows
                         if any(clean_row):
+                            row_dict['_page'] = page_no
+                            row_dict['_top'] = table_row.bbox[1]
+                            row_dict['_bottom'] = table_row.bbox[3]
                             all_data.append(row_dict)
     
     return all_data
 
-def pdf_to_excel(pdf_path, output_path=None, method='auto'):
+def detect_pdf_layout(pdf):
+    """Pick an extractor by sampling the first pages' text and tables.
+    Returns (method, reason)."""
+    
+    layout = PDF_LAYOUTS['fabrizio']
+    header_hits = set()
+    product_lines = 0
+    table_rows = 0
+    
+    for page in pdf.pages[:SAMPLE_PAGES]:
+        text = (page.extract_text() or '').upper()
+        
+        header_hits.update(k for k in layout['header_keywords'] if k in text)
+        
+        for line in text.split('\n'):
+            if any(k in line for k in layout['row_keywords']) and re.search(layout['row_pattern'], line):
+                product_lines += 1
+        
+        # Only count tables with real structure (a header plus rows, several columns)
+        for found_table in page.find_tables():
+            if len(found_table.rows) >= 2 and len(found_table.columns) >= 3:
+                table_rows += len(found_table.rows) - 1
+    
+    has_markers = all(k in header_hits for k in layout['marker_keywords'])
+    stats = (f"{len(header_hits)} header keyword(s), fabrizio markers {'found' if has_markers else 'not found'}, "
+             f"{product_lines} product line(s), {table_rows} table row(s)")
+    
+    # A ruled table holding the products beats any header words: generic keeps every column
+    if table_rows > 0 and table_rows >= product_lines * TABLE_COVERAGE:
+        return 'generic', stats
+    
+    # Fabrizio-only header with product lines that table detection can't see
+    if has_markers and product_lines > 0:
+        return 'fabrizio', stats
+    
+    if table_rows > 0:
+        return 'generic', stats
+    
+    # No tables at all: text lines are the only usable source
+    if product_lines > 0:
+        return 'fabrizio', stats
+    
+    return 'generic', stats
+
+def encode_thumbnail(page, image, raw_data, target):
+    """Encode one image as a JPEG thumbnail, written atomically to target"""
+    
+    try:
+        # JPEG/JPEG2000 streams can be decoded directly
+        thumb = Image.open(io.BytesIO(raw_data))
+        thumb.load()
+    except Exception:
+        # Anything else (Flate, masks, CMYK...) is rendered from the page
+        bbox = (
+            max(image['x0'], page.bbox[0]),
+            max(image['top'], page.bbox[1]),
+            min(image['x1'], page.bbox[2]),
+            min(image['bottom'], page.bbox[3])
+        )
+        thumb = page.crop(bbox).to_image(resolution=150).original
+    
+    thumb = thumb.convert('RGB')
+    thumb.thumbnail(THUMBNAIL_SIZE)
+    
+    # Other workers may store the same image, so never expose a partial file
+    target.parent.mkdir(parents=True, exist_ok=True)
+    with atomic_output(target) as temp_target:
+        thumb.save(temp_target, format='JPEG', quality=85)
+
+def extract_page_images(pdf_path, page_numbers, images_dir):
+    """Worker: store the images of the given pages by content hash"""
+    
+    records = []
+    images_dir = Path(images_dir)
+    
+    with pdfplumber.open(pdf_path) as pdf:
+        for page_no in page_numbers:
+            page = pdf.pages[page_no]
+            
+            for image in page.images:
+                if image['width'] < MIN_IMAGE_SIZE or image['height'] < MIN_IMAGE_SIZE:
+                    continue
+                
+                stream = image['stream']
+                raw_data = stream.get_rawdata() or stream.get_data()
+                digest = hashlib.sha256(raw_data).hexdigest()
+                target = images_dir / digest[:2] / f"{digest}.jpg"
+                
+                # Content-addressed: an existing file is already this image
+                if not target.exists():
+                    try:
+                        encode_thumbnail(page, image, raw_data, target)
+                    except Exception as e:
+                        print(f"  ! Could not store image on page {page_no + 1}: {e}")
+                        continue
+                
+                records.append({
+                    'page': page_no,
+                    'top': image['top'],
+                    'bottom': image['bottom'],
+                    'path': target
+                })
+    
+    return records
+
+def extract_images(pdf_path, images_dir, workers=None):
+    """Extract images from all pages using parallel workers"""
+    
+    with pdfplumber.open(pdf_path) as pdf:
+        page_count = len(pdf.pages)
+    
+    if page_count == 0:
+        return []
+    
+    workers = min(workers or os.cpu_count() or 1, page_count)
+    
+    # Contiguous page ranges, so each worker opens the PDF once
+    chunk_size = -(-page_count // workers)
+    chunks = [list(range(start, min(start + chunk_size, page_count)))
+              for start in range(0, page_count, chunk_size)]
+    
+    if len(chunks) == 1:
+        return extract_page_images(str(pdf_path), chunks[0], str(images_dir))
+    
+    records = []
+    with ProcessPoolExecutor(max_workers=len(chunks)) as executor:
+        futures = [executor.submit(extract_page_images, str(pdf_path), chunk, str(images_dir))
+                   for chunk in chunks]
+        for future in futures:
+            records.extend(future.result())
+    
+    return records
+
+def image_column_for(data):
+    """Column for linked image paths, never one the extracted table already uses"""
+    if any(IMAGE_COLUMN in row for row in data):
+        return IMAGE_FALLBACK_COLUMN
+    return IMAGE_COLUMN
+
+def link_images_to_rows(data, image_records, output_dir, image_column=IMAGE_COLUMN):
+    """Set image_column of each row to the image overlapping it vertically"""
+    
+    images_by_page = {}
+    for record in image_records:
+        images_by_page.setdefault(record['page'], []).append(record)
+    
+    for row in data:
+        best_image, best_overlap = None, 0
+        
+        for record in images_by_page.get(row.get('_page'), []):
+            overlap = min(row['_bottom'], record['bottom']) - max(row['_top'], record['top'])
+            if overlap > best_overlap:
+                best_image, best_overlap = record, overlap
+        
+        if best_image is None:
+            row[image_column] = ""
+            continue
+        
+        # Paths relative to the workbook keep the output folder portable
+        try:
+            row[image_column] = Path(os.path.relpath(best_image['path'], output_dir)).as_posix()
+        except ValueError:
+            row[image_column] = Path(best_image['path']).as_posix()
+    
+    return data
+
+def write_excel_workbook(output_path, sheets):
+    """Write (sheet_name, df) pairs to a plain workbook"""
+    with atomic_output(output_path) as temp_path:
+        with pd.ExcelWriter(temp_path, engine='openpyxl') as writer:
+            for sheet_name, df in sheets:
+                df.to_excel(writer, sheet_name=sheet_name, index=False)
+
+def pdf_to_excel(pdf_path, output_path=None, method='auto', images=False, images_dir=None, workers=None,
+                 shard_by=None, shard_rows=DEFAULT_SHARD_ROWS, shard_mode='workbooks'):
     pdf_path = Path(pdf_path)
     
     if not pdf_path.exists():
@@ -141,41 +356,67 @@ def pdf_to_excel(pdf_path, output_path=None, method='auto'):
     if output_path is None:
         output_path = pdf_path.parent / f"{pdf_path.stem}_EXTRACTED.xlsx"
     
+    # Bad sharding options are a caller error, not a per-file failure
+    if shard_by:
+        check_shard_options(shard_by, shard_rows, shard_mode)
+    
     print(f"Extracting data from {pdf_path.name}...")
     
     try:
-        # Detect method
-        if method == 'auto':
-            # Check filename OR content hint could go here
-            if 'FABRIZIO' in pdf_path.name.upper() or 'PRICE LIST' in pdf_path.name.upper():
-                 # NEW PRICE LIST is likely Fabrizio style too
-                method = 'fabrizio'
+        # One open PDF for detection and extraction, so pages are parsed once
+        with pdfplumber.open(pdf_path) as pdf:
+            # Detect method from the content of the first pages
+            if method == 'auto':
+                method, reason = detect_pdf_layout(pdf)
+                print(f"  Detected layout: {method} ({reason})")
+            
+            # Extract data
+            if method == 'fabrizio':
+                print("  Using Fabrizio-specific extraction...")
+                data = extract_fabrizio_data(pdf)
+                # Safety net; pages are already parsed on this handle, so this is cheap
+                if not data:
+                    print("  ! Specific extraction found no data, falling back to generic...")
+                    data = extract_generic_table(pdf)
             else:
-                method = 'generic'
-        
-        # Extract data
-        if method == 'fabrizio':
-            print("  Using Fabrizio-specific extraction...")
-            data = extract_fabrizio_data(pdf_path)
-            # Fallback if specific method fails
-            if not data: 
-                print("  ! Specific extraction found no data, falling back to generic...")
-                data = extract_generic_table(pdf_path)
-        else:
-            print("  Using generic table extraction...")
-            data = extract_generic_table(pdf_path)
+                print("  Using generic table extraction...")
+                data = extract_generic_table(pdf)
         
         if not data:
             print("  ⚠️  No data extracted. PDF may not contain tables.")
             return False
         
-        # Convert to DataFrame
-        df = pd.DataFrame(data)
+        # Extract swatch images and link them to rows
+        if images:
+            output_dir = Path(output_path).parent
+            if images_dir is None:
+                images_dir = output_dir / "images"
+            
+            print(f"  Extracting images to {images_dir}...")
+            image_records = extract_images(pdf_path, images_dir, workers)
+            image_column = image_column_for(data)
+            if image_column != IMAGE_COLUMN:
+                print(f"  Table has its own {IMAGE_COLUMN} column, linking images in {image_column}")
+            data = link_images_to_rows(data, image_records, output_dir, image_column)
+            
+            linked = sum(1 for row in data if row[image_column])
+            unique = len({record['path'] for record in image_records})
+            print(f"  Linked {linked} row(s) to {unique} unique image(s)")
         
-        # Save to Excel
-        df.to_excel(output_path, index=False, engine='openpyxl')
+        # Convert to DataFrame (position keys are only needed for linking)
+        df = pd.DataFrame(data)
+        df = df.drop(columns=[c for c in ROW_POSITION_KEYS if c in df.columns])
         
-        print(f"✅ SUCCESS! Extracted {len(df)} rows to: {output_path}")
+        if shard_by:
+            # Split into several workbooks/sheets with an index file
+            shards = split_into_shards(df, shard_by, 'COLLECTION NAME', shard_rows)
+            entries = write_shards(output_path, shards, write_excel_workbook, shard_mode)
+            print(f"✅ SUCCESS! Extracted {len(df)} rows to {len(entries)} shard(s) ({shard_mode})")
+        else:
+            # Save to Excel
+            write_excel_workbook(output_path, [('Sheet1', df)])
+            
+            print(f"✅ SUCCESS! Extracted {len(df)} rows to: {output_path}")
         # Safe printing of columns (handles None or non-string headers)
         safe_cols = [str(c) for c in df.columns]
         print(f"   Columns: {', '.join(safe_cols)}")
@@ -190,12 +431,25 @@ def pdf_to_excel(pdf_path, output_path=None, method='auto'):
 
 if __name__ == "__main__":
     if len(sys.argv) < 2:
-        print("Usage: python pdf_to_excel.py <pdf_file> [output_file] [method]")
+        print("Usage: python pdf_to_excel.py <pdf_file> [output_file] [method] [--images]")
+        print("       [--shard-by=collection|rows] [--shard-rows=N] [--shard-mode=workbooks|sheets]")
         sys.exit(1)
     
-    pdf_file = sys.argv[1]
-    output_file = sys.argv[2] if len(sys.argv) > 2 else None
-    method = sys.argv[3] if len(sys.argv) > 3 else 'auto'
+    # --name or --name=value options
+    flags = dict((arg[2:].split('=', 1) + [True])[:2] for arg in sys.argv[1:] if arg.startswith('--'))
+    args = [arg for arg in sys.argv[1:] if not arg.startswith('--')]
+    
+    pdf_file = args[0]
+    output_file = args[1] if len(args) > 1 else None
+    method = args[2] if len(args) > 2 else 'auto'
     
-    success = pdf_to_excel(pdf_file, output_file, method)
+    success = pdf_to_excel(
+        pdf_file,
+        output_file,
+        method,
+        images='images' in flags,
+        shard_by=flags.get('shard-by'),
+        shard_rows=int(flags.get('shard-rows', DEFAULT_SHARD_ROWS)),
+        shard_mode=flags.get('shard-mode', 'workbooks')
+    )
     sys.exit(0 if success else 1)
\ No newline at end of file
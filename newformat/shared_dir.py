@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+"""
+Shared Directory - Safe catalog processing from several processes or machines
+Work is claimed with lease (lock) files and outputs are written atomically
+"""
+
+import json
+import os
+import socket
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from pathlib import Path
+
+# A claim not refreshed for this long is treated as abandoned (killed worker)
+DEFAULT_LEASE_SECONDS = 30 * 60
+
+def worker_id():
+    """Identify this process across machines sharing a folder"""
+    return f"{socket.gethostname()}-{os.getpid()}"
+
+def unique_temp_path(path):
+    """Hidden, per-worker temp name in the same folder (so rename stays atomic)"""
+    path = Path(path)
+    token = f"{worker_id()}.{uuid.uuid4().hex[:8]}"
+    return path.with_name(f".{path.stem}.{token}.tmp{path.suffix}")
+
+def is_temp_or_lock(path):
+    """True for our temp/lock files and Excel's ~$ lock files"""
+    name = Path(path).name
+    return name.startswith('.') or name.startswith('~$') or name.endswith('.lock')
+
+@contextmanager
+def atomic_output(path):
+    """Yield a temp path to write to; it replaces path only if the write succeeds"""
+    temp_path = unique_temp_path(path)
+    try:
+        yield temp_path
+        os.replace(temp_path, path)
+    finally:
+        if temp_path.exists():
+            temp_path.unlink()
+
+def is_up_to_date(output_path, input_path):
+    """Output exists (outputs are only ever renamed into place) and is newer than input"""
+    output_path = Path(output_path)
+    return output_path.exists() and output_path.stat().st_mtime >= Path(input_path).stat().st_mtime
+
+def read_lease(lock_path):
+    """Return (token, mtime) of a lock file, or None if it is gone"""
+    try:
+        mtime = Path(lock_path).stat().st_mtime
+        with open(lock_path) as f:
+            data = f.read()
+    except FileNotFoundError:
+        return None
+
+    try:
+        token = json.loads(data).get('token')
+    except ValueError:
+        token = None  # Writer died before filling it in
+
+    return token or f"mtime-{mtime}", mtime
+
+def take_over_stale(lock_path, stale_token, lease_seconds=DEFAULT_LEASE_SECONDS):
+    """Remove an expired lock so it can be claimed again. Returns True if the lock is gone.
+
+    The O_EXCL marker is named after the expired lease's token, so only one
+    worker at a time can act on that lease. The token is checked again while
+    holding the marker, so a lock another worker has just re-created is
+    never removed.
+    """
+
+    marker_path = Path(f"{lock_path}.takeover-{stale_token}")
+    try:
+        os.close(os.open(marker_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+    except FileExistsError:
+        # Someone else is taking over; clear the marker only if that worker died mid-way
+        try:
+            if time.time() - marker_path.stat().st_mtime >= lease_seconds:
+                marker_path.unlink()
+        except FileNotFoundError:
+            pass
+        return False
+
+    try:
+        current = read_lease(lock_path)
+        if current is None:
+            return True
+        token, mtime = current
+        if token != stale_token or time.time() - mtime < lease_seconds:
+            return False  # Already taken over (or refreshed) by someone else
+        os.remove(lock_path)
+        return True
+    finally:
+        try:
+            marker_path.unlink()
+        except FileNotFoundError:
+            pass
+
+def try_claim(target, lease_seconds=DEFAULT_LEASE_SECONDS):
+    """Create <target>.lock exclusively. Returns (lock_path, token) or None if taken."""
+
+    lock_path = Path(f"{target}.lock")
+    token = uuid.uuid4().hex
+    info = json.dumps({'worker': worker_id(), 'token': token, 'claimed_at': time.time()})
+
+    for _ in range(2):
+        try:
+            fd = os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except FileExistsError:
+            lease = read_lease(lock_path)
+            if lease is None:
+                continue  # Released meanwhile, try again
+
+            stale_token, mtime = lease
+            if time.time() - mtime < lease_seconds:
+                return None
+
+            # Expired lease (killed worker): remove it, then race for it via O_EXCL again
+            if not take_over_stale(lock_path, stale_token, lease_seconds):
+                return None
+            continue
+
+        with os.fdopen(fd, 'w') as f:
+            f.write(info)
+        return lock_path, token
+
+    return None
+
+def release_claim(lock_path, token):
+    """Remove the lock, unless another worker has taken over the lease"""
+    try:
+        with open(lock_path) as f:
+            if json.load(f).get('token') != token:
+                return
+        os.remove(lock_path)
+    except (FileNotFoundError, ValueError):
+        pass
+
+@contextmanager
+def claim(target, lease_seconds=DEFAULT_LEASE_SECONDS):
+    """Claim a piece of work for the duration of the block.
+
+    Yields True if this worker owns target, False if someone else does.
+    The lease is refreshed in the background so long jobs are not stolen.
+    """
+
+    claimed = try_claim(target, lease_seconds)
+    if claimed is None:
+        yield False
+        return
+
+    lock_path, token = claimed
+    stop = threading.Event()
+
+    def heartbeat():
+        while not stop.wait(lease_seconds / 3):
+            try:
+                os.utime(lock_path)
+            except FileNotFoundError:
+                return
+
+    thread = threading.Thread(target=heartbeat, daemon=True)
+    thread.start()
+
+    try:
+        yield True
+    finally:
+        stop.set()
+        thread.join()
+        release_claim(lock_path, token)